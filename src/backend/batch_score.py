@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Offline batch scoring for large scene archives.
+
+Reads CSV, Parquet or NDJSON input in chunks, scores the chunks on a pool of
+worker processes (each loading the model once) and writes one Parquet part
+file per chunk to the output directory. Re-running the same command after an
+interruption skips the parts that were already written.
+
+With --progressive, RandomForest models stop evaluating trees for a row as
+soon as its risk level is settled within --error-bound (see
+services/progressive.py); the probability column is then an estimate.
+
+Example:
+    python batch_score.py scenes.parquet scored/ --workers 8 --keep-columns scene_id
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from services.inference import (
+    DEFAULT_MODEL_DIR, FEATURE_NAMES, load_model_artifacts, frame_to_array,
+    get_risk_levels, compute_confidence
+)
+from services.progressive import (
+    DEFAULT_TREE_CHUNK, DEFAULT_ERROR_BOUND, build_progressive, predict_progressive
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("batch_score")
+
+MANIFEST_NAME = "_manifest.json"
+FORMATS = ("csv", "parquet", "ndjson")
+
+# Per-process model state, filled in by _init_worker
+_worker_state = {}
+
+def detect_format(path: Path) -> str:
+    """Guess the input format from the file extension"""
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".txt"):
+        return "csv"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    if suffix in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError(f"Cannot detect input format of {path}, pass --format")
+
+def input_columns(path: Path, fmt: str) -> List[str]:
+    """Column names of the input, read from the header/schema/first record only"""
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    if fmt == "ndjson":
+        return list(pd.read_json(path, lines=True, nrows=1).columns)
+    raise ValueError(f"Unsupported input format: {fmt}")
+
+def check_columns(available: List[str], columns: List[str]):
+    missing = [name for name in columns if name not in available]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+
+def iter_chunks(path: Path, fmt: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """Yield the input file as DataFrames of at most chunk_size rows"""
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "ndjson":
+        with pd.read_json(path, lines=True, chunksize=chunk_size) as reader:
+            for frame in reader:
+                # NDJSON has no schema, a later record may still lack a column
+                check_columns(list(frame.columns), columns)
+                yield frame[columns]
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+def part_path(output_dir: Path, index: int) -> Path:
+    return output_dir / f"part-{index:06d}.parquet"
+
+def _init_worker(model_dir: str, progressive: bool):
+    """Load the model once per worker process"""
+    artifacts = load_model_artifacts(Path(model_dir), allow_mock=False)
+    # Parallelism comes from the process pool, keep each worker single threaded
+    if hasattr(artifacts["model"], "n_jobs"):
+        artifacts["model"].n_jobs = 1
+    if progressive:
+        artifacts["progressive"] = build_progressive(artifacts["model"])
+    _worker_state.update(artifacts)
+
+def _score_chunk(index: int, start_row: int, frame: pd.DataFrame, output_dir: str,
+                 keep_columns: List[str], progressive_options: Optional[dict]) -> Tuple[int, int, int]:
+    """Score one chunk and write it as a Parquet part file"""
+    features_scaled = _worker_state["scaler"].transform(frame_to_array(frame))
+
+    if progressive_options is None:
+        probabilities = _worker_state["model"].predict_proba(features_scaled)[:, 1]
+        risk_levels = get_risk_levels(probabilities)
+        trees_used = None
+    else:
+        probabilities, risk_levels, trees_used = predict_progressive(
+            _worker_state["model"], _worker_state["progressive"], features_scaled, **progressive_options
+        )
+
+    result = frame[keep_columns].reset_index(drop=True)
+    result.insert(0, "row_number", range(start_row, start_row + len(frame)))
+    result["flood_probability"] = probabilities
+    result["risk_level"] = risk_levels
+    result["confidence"] = compute_confidence(probabilities)
+    if trees_used is not None:
+        result["trees_evaluated"] = trees_used
+
+    # Write to a temporary name first so a killed run never leaves a partial part behind
+    final_path = part_path(Path(output_dir), index)
+    tmp_path = final_path.with_suffix(".tmp")
+    result.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, final_path)
+    return index, len(frame), int(trees_used.sum()) if trees_used is not None else 0
+
+def prepare_output(output_dir: Path, manifest: dict, resume: bool) -> set:
+    """Create the output directory and return the chunk indexes already scored"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    done = set()
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text())
+        previous.pop("complete", None)
+        if not resume:
+            for part in output_dir.glob("part-*.parquet"):
+                part.unlink()
+        elif previous != manifest:
+            raise ValueError(
+                f"{output_dir} holds output of a different run, "
+                "use another directory or pass --no-resume to overwrite it"
+            )
+        else:
+            done = {int(part.stem.split("-")[1]) for part in output_dir.glob("part-*.parquet")}
+
+    for tmp in output_dir.glob("part-*.tmp"):
+        tmp.unlink()
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return done
+
+def run(input_path: Path, output_dir: Path, fmt: Optional[str] = None, chunk_size: int = 50000,
+        workers: Optional[int] = None, model_dir: Path = DEFAULT_MODEL_DIR,
+        keep_columns: Optional[List[str]] = None, resume: bool = True,
+        max_pending: Optional[int] = None, report_every: float = 10.0,
+        progressive: bool = False, tree_chunk: int = DEFAULT_TREE_CHUNK,
+        error_bound: float = DEFAULT_ERROR_BOUND) -> dict:
+    """Score input_path into output_dir and return throughput statistics"""
+    fmt = fmt or detect_format(input_path)
+    # Workers load the model in their initializer, where a missing file would only break the pool
+    if not (Path(model_dir) / "flood_prediction_model.pkl").exists():
+        raise FileNotFoundError(f"No model artifacts found in {Path(model_dir).absolute()}")
+    workers = workers or os.cpu_count() or 1
+    # Bounds memory: only this many chunks are held in the parent or queued to workers
+    max_pending = max_pending or workers * 2
+    keep_columns = [c for c in (keep_columns or []) if c not in FEATURE_NAMES]
+    columns = FEATURE_NAMES + keep_columns
+    progressive_options = {"tree_chunk": tree_chunk, "error_bound": error_bound} if progressive else None
+    check_columns(input_columns(input_path, fmt), columns)
+
+    manifest = {
+        "input": str(input_path.resolve()),
+        "input_size": input_path.stat().st_size,
+        "format": fmt,
+        "chunk_size": chunk_size,
+        "model_dir": str(Path(model_dir).resolve()),
+        "keep_columns": keep_columns,
+        "progressive": progressive_options,
+    }
+    done = prepare_output(output_dir, manifest, resume)
+    if done:
+        logger.info(f"Resuming, {len(done)} chunks already scored")
+
+    stats = {"rows": 0, "chunks": 0, "skipped_chunks": 0}
+    trees_evaluated = 0
+    started = last_report = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(model_dir), progressive)) as pool:
+        pending = set()
+
+        def collect(return_when):
+            nonlocal pending, last_report, trees_evaluated
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                _, rows, trees = future.result()
+                stats["rows"] += rows
+                trees_evaluated += trees
+                stats["chunks"] += 1
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                last_report = now
+                logger.info(f"Scored {stats['rows']} rows, {stats['rows'] / (now - started):.0f} rows/sec")
+
+        start_row = 0
+        for index, frame in enumerate(iter_chunks(input_path, fmt, chunk_size, columns)):
+            if index in done:
+                stats["skipped_chunks"] += 1
+            else:
+                pending.add(pool.submit(_score_chunk, index, start_row, frame,
+                                        str(output_dir), keep_columns, progressive_options))
+                if len(pending) >= max_pending:
+                    collect(FIRST_COMPLETED)
+            start_row += len(frame)
+
+        while pending:
+            collect(FIRST_COMPLETED)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    stats["workers"] = workers
+    if progressive and stats["rows"]:
+        stats["mean_trees_evaluated"] = round(trees_evaluated / stats["rows"], 2)
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest["complete"] = True
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a scene archive offline with the FloodSense model")
+    parser.add_argument("input", type=Path, help="CSV, Parquet or NDJSON file with the model features")
+    parser.add_argument("output_dir", type=Path, help="Directory for the Parquet part files")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--model-dir", type=Path, default=DEFAULT_MODEL_DIR, help="Directory with the model artifacts")
+    parser.add_argument("--keep-columns", nargs="*", default=[], help="Input columns copied to the output, e.g. an ID")
+    parser.add_argument("--max-pending", type=int, help="Chunks in flight at once (default: 2 x workers)")
+    parser.add_argument("--no-resume", action="store_true", help="Discard earlier output instead of resuming")
+    parser.add_argument("--progressive", action="store_true", help="Stop evaluating trees once the risk level is settled")
+    parser.add_argument("--tree-chunk", type=int, default=DEFAULT_TREE_CHUNK, help="Trees evaluated between early-exit checks")
+    parser.add_argument("--error-bound", type=float, default=DEFAULT_ERROR_BOUND,
+                        help="Allowed probability of a row getting a different risk level than full evaluation")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.tree_chunk < 1 or not 0 <= args.error_bound < 1:
+        logger.error("--tree-chunk must be at least 1 and --error-bound in [0, 1)")
+        return 1
+    try:
+        stats = run(
+            args.input, args.output_dir, fmt=args.format, chunk_size=args.chunk_size,
+            workers=args.workers, model_dir=args.model_dir, keep_columns=args.keep_columns,
+            resume=not args.no_resume, max_pending=args.max_pending,
+            progressive=args.progressive, tree_chunk=args.tree_chunk, error_bound=args.error_bound
+        )
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(str(e))
+        return 1
+    except BrokenProcessPool:
+        logger.error(f"A worker process failed, check that the model artifacts in {args.model_dir} load correctly")
+        return 1
+
+    logger.info(
+        f"Scored {stats['rows']} rows in {stats['seconds']}s "
+        f"({stats['rows_per_sec']} rows/sec, {stats['workers']} workers, "
+        f"{stats['skipped_chunks']} chunks resumed)"
+    )
+    print(json.dumps(stats))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load generator and latency report for the FloodSense API.
+
+Replays a weighted mix of requests against a running server (--url), the app
+served in-process over ASGI (--in-process), or freshly started uvicorn
+servers with different worker counts (--compare-workers). Prints a JSON
+report with throughput, error rate and latency percentiles per endpoint.
+
+Request kinds for --mix (name=weight, comma separated):
+    predict            single /predict, payload built like the frontend's api.predict
+    predict-batch:N    /predict-batch with N generated items
+    regions, alerts, health, model-info, models
+
+Arrival modes:
+    closed  --concurrency users each send a request, wait for the response,
+            then wait --think-time seconds
+    open    requests arrive as a Poisson process at --rate per second,
+            regardless of how fast the server answers
+
+Examples:
+    python loadgen.py --in-process --mode closed --concurrency 16 --duration 20
+    python loadgen.py --url http://localhost:8000 --mode open --rate 200 \\
+        --mix predict=80,predict-batch:50=10,regions=5,alerts=5
+    python loadgen.py --compare-workers 1,2,4 --mode open --rate 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+API_PREFIX = "/api/v1"
+DEFAULT_MIX = "predict=70,predict-batch:10=10,predict-batch:100=5,regions=10,alerts=5"
+
+# Same places the frontend map offers, see api/routes/locations.py
+LOCATIONS = [
+    {"lat": 6.2088, "lng": 31.5594, "region": "Jonglei"},
+    {"lat": 9.2333, "lng": 29.7833, "region": "Unity"},
+    {"lat": 9.5334, "lng": 31.6605, "region": "Upper Nile"},
+    {"lat": 8.7667, "lng": 27.4000, "region": "Northern Bahr el Ghazal"},
+    {"lat": 8.1167, "lng": 29.6667, "region": "Warrap"},
+    {"lat": 4.8594, "lng": 31.5713, "region": "Central Equatoria"},
+]
+
+SIMPLE_ENDPOINTS = {
+    "regions": "/regions",
+    "alerts": "/alerts",
+    "health": "/health",
+    "model-info": "/model-info",
+    "models": "/models",
+}
+
+def make_features(now: Optional[datetime] = None) -> dict:
+    """Satellite metadata features, generated the way src/frontend/src/services/api.js does"""
+    now = now or datetime.now()
+    return {
+        "month": now.month,
+        "day": now.day,
+        "day_of_week": (now.weekday() + 1) % 7,  # JavaScript getDay(), Sunday = 0
+        "day_of_year": now.timetuple().tm_yday,
+        "quarter": (now.month + 2) // 3,
+        "days_since_reference": (now - datetime(2020, 1, 1)).days,
+        "scene_id_numeric": random.randint(50, 399),
+        "data_coverage": random.randint(0, 1),
+        "filename_length": random.randint(8, 19),
+        "filename_hash": random.random(),
+        "observation_index": random.randint(0, 1499),
+    }
+
+def make_predict_payload() -> dict:
+    return {"features": make_features(), "location": random.choice(LOCATIONS + [None])}
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """Parse 'kind=weight,...' into a list of (kind, weight)"""
+    mix = []
+    for item in spec.split(","):
+        kind, _, weight = item.strip().partition("=")
+        name, _, size = kind.partition(":")
+        if name == "predict-batch":
+            if not size.isdigit() or not 1 <= int(size) <= 100:
+                raise ValueError(f"predict-batch needs a batch size of 1-100, e.g. predict-batch:10, got {kind!r}")
+        elif name != "predict" and name not in SIMPLE_ENDPOINTS:
+            raise ValueError(f"Unknown request kind: {kind!r}")
+        mix.append((kind, float(weight or 1)))
+    return mix
+
+def build_request(kind: str) -> Tuple[str, str, Optional[dict]]:
+    """Return method, path and JSON body for a request kind"""
+    if kind == "predict":
+        return "POST", f"{API_PREFIX}/predict", make_predict_payload()
+    if kind.startswith("predict-batch:"):
+        size = int(kind.split(":")[1])
+        return "POST", f"{API_PREFIX}/predict-batch", {
+            "predictions": [make_predict_payload() for _ in range(size)]
+        }
+    return "GET", f"{API_PREFIX}{SIMPLE_ENDPOINTS[kind]}", None
+
+class Recorder:
+    """Collects (kind, latency, ok) for every completed request after warm-up"""
+
+    def __init__(self, warmup: float):
+        self.warmup_until = time.perf_counter() + warmup
+        self.samples = []
+        self.dropped = 0
+
+    def record(self, kind: str, started: float, ok: bool):
+        if started >= self.warmup_until:
+            self.samples.append((kind, time.perf_counter() - started, ok))
+
+async def send(client: httpx.AsyncClient, kind: str, recorder: Recorder, started: Optional[float] = None):
+    # Open loop passes the scheduled start time so queueing delay counts as latency
+    started = started if started is not None else time.perf_counter()
+    method, path, body = build_request(kind)
+    try:
+        response = await client.request(method, path, json=body)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(kind, started, ok)
+
+async def run_closed(client, mix, recorder, duration: float, concurrency: int, think_time: float):
+    kinds, weights = zip(*mix)
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await send(client, random.choices(kinds, weights)[0], recorder)
+            if think_time:
+                await asyncio.sleep(random.expovariate(1 / think_time))
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+async def run_open(client, mix, recorder, duration: float, rate: float, max_outstanding: int):
+    kinds, weights = zip(*mix)
+    start = time.perf_counter()
+    next_at = start
+    outstanding = set()
+
+    while next_at < start + duration:
+        # Always yield so responses are processed even when arrivals fall behind schedule
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        if len(outstanding) >= max_outstanding:
+            recorder.dropped += 1
+        else:
+            task = asyncio.create_task(send(client, random.choices(kinds, weights)[0], recorder, next_at))
+            outstanding.add(task)
+            task.add_done_callback(outstanding.discard)
+        next_at += random.expovariate(rate)
+
+    if outstanding:
+        await asyncio.gather(*outstanding)
+
+def latency_summary(latencies: List[float]) -> dict:
+    if not latencies:
+        return {}
+    ms = np.array(latencies) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    def stats(samples):
+        errors = sum(1 for _, _, ok in samples if not ok)
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency": latency_summary([latency for _, latency, ok in samples if ok]),
+        }
+
+    by_kind = {}
+    for sample in recorder.samples:
+        by_kind.setdefault(sample[0], []).append(sample)
+
+    report = stats(recorder.samples)
+    report["dropped"] = recorder.dropped
+    report["endpoints"] = {kind: stats(samples) for kind, samples in sorted(by_kind.items())}
+    return report
+
+async def run_load(args, base_url: Optional[str] = None) -> dict:
+    """Run one load test against base_url, or in-process when base_url is None"""
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+
+    async def drive(client):
+        recorder = Recorder(args.warmup)
+        started = time.perf_counter()
+        if args.mode == "closed":
+            await run_closed(client, mix, recorder, args.duration + args.warmup, args.concurrency, args.think_time)
+        else:
+            await run_open(client, mix, recorder, args.duration + args.warmup, args.rate, args.max_outstanding)
+        elapsed = time.perf_counter() - started - args.warmup
+        return summarize(recorder, elapsed)
+
+    if base_url is None:
+        import main as backend
+
+        # Record unhandled server exceptions as 500s instead of raising them in the client
+        transport = httpx.ASGITransport(app=backend.app, raise_app_exceptions=False)
+        # ASGITransport does not run lifespan events, so load the model ourselves
+        async with backend.app.router.lifespan_context(backend.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=timeout) as client:
+                report = await drive(client)
+    else:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            report = await drive(client)
+
+    report["config"] = {
+        "target": base_url or "in-process",
+        "mode": args.mode,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "mix": dict(mix),
+        **({"concurrency": args.concurrency, "think_time_s": args.think_time} if args.mode == "closed"
+           else {"rate_rps": args.rate, "max_outstanding": args.max_outstanding}),
+    }
+    return report
+
+def start_server(workers: int, port: int, server_args: List[str]) -> subprocess.Popen:
+    """Start uvicorn serving main:app and wait until /health answers"""
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(workers), "--log-level", "warning", *server_args
+    ]
+    process = subprocess.Popen(command, cwd=Path(__file__).resolve().parent)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{API_PREFIX}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError("Server did not become healthy within 60s")
+
+def compare_workers(args) -> dict:
+    runs = []
+    for workers in [int(n) for n in args.compare_workers.split(",")]:
+        process = start_server(workers, args.port, args.server_args)
+        try:
+            report = asyncio.run(run_load(args, f"http://127.0.0.1:{args.port}"))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        report["config"]["workers"] = workers
+        report["config"]["server_args"] = args.server_args
+        runs.append(report)
+        print(f"workers={workers}: {report['throughput_rps']} req/s, "
+              f"p99 {report['latency'].get('p99_ms')} ms, error rate {report['error_rate']}", file=sys.stderr)
+    return {"runs": runs}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load against the FloodSense API and report latency")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running API, e.g. http://localhost:8000")
+    target.add_argument("--in-process", action="store_true", help="Serve main:app in this process over ASGI")
+    target.add_argument("--compare-workers", help="Comma separated uvicorn worker counts to start and compare, e.g. 1,2,4")
+    parser.add_argument("--port", type=int, default=8765, help="Port for servers started by --compare-workers")
+    parser.add_argument("--server-args", nargs=argparse.REMAINDER, default=[],
+                        help="Extra uvicorn arguments for --compare-workers (must come last)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted request mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed", help="Arrival model")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: concurrent users")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: mean pause between a user's requests")
+    parser.add_argument("--rate", type=float, default=100.0, help="Open loop: requests per second")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="Open loop: in-flight cap, extra arrivals are dropped")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", type=Path, help="Also write the JSON report to this file")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible request mixes")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    try:
+        parse_mix(args.mix)
+        if args.compare_workers:
+            report = compare_workers(args)
+        else:
+            report = asyncio.run(run_load(args, None if args.in_process else args.url or "http://localhost:8000"))
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        args.output.write_text(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
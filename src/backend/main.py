@@ -1,16 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
-import joblib
 import numpy as np
 import pandas as pd
 from datetime import datetime
+import asyncio
 import logging
 import os
-from pathlib import Path
 from contextlib import asynccontextmanager
+from services.inference import DEFAULT_MODEL_DIR, FEATURE_NAMES, get_risk_level, compute_confidence
+from services.explain import explain_rows
+from services.progressive import DEFAULT_TREE_CHUNK, DEFAULT_ERROR_BOUND, predict_progressive
+from services.model_registry import ModelRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,43 +25,16 @@ async def lifespan(app: FastAPI):
     
     # Try to load models, create mock models if not found
     try:
-        model_dir = Path("../../models")
-        
-        if (model_dir / "flood_prediction_model.pkl").exists():
-            model_cache["model"] = joblib.load(model_dir / "flood_prediction_model.pkl")
-            model_cache["scaler"] = joblib.load(model_dir / "feature_scaler.pkl")
-            model_cache["model_info"] = joblib.load(model_dir / "model_info.pkl")
-            logger.info("Real models loaded successfully")
-        else:
-            # Create mock models for demonstration
-            from sklearn.ensemble import RandomForestClassifier
-            from sklearn.preprocessing import StandardScaler
-            
-            # Create and train a simple mock model
-            X_mock = np.random.rand(100, 11)
-            y_mock = np.random.randint(0, 2, 100)
-            
-            mock_model = RandomForestClassifier(n_estimators=10, random_state=42)
-            mock_model.fit(X_mock, y_mock)
-            
-            mock_scaler = StandardScaler()
-            mock_scaler.fit(X_mock)
-            
-            model_cache["model"] = mock_model
-            model_cache["scaler"] = mock_scaler
-            model_cache["model_info"] = {"type": "mock", "accuracy": 0.9988}
-            logger.info("Mock models created successfully")
-        
-        model_cache["feature_names"] = [
-            "month", "day", "day_of_week", "day_of_year", "quarter",
-            "days_since_reference", "scene_id_numeric", "data_coverage",
-            "filename_length", "filename_hash", "observation_index"
-        ]
+        registry = ModelRegistry.from_dir(DEFAULT_MODEL_DIR)
+        # Load the default model eagerly, the others are loaded on first use
+        registry.get(registry.default_id)
+        model_cache["registry"] = registry
+        model_cache["feature_names"] = list(FEATURE_NAMES)
         model_cache["startup_time"] = datetime.now()
         
     except Exception as e:
         logger.error(f"Failed to load/create models: {e}")
-        model_cache["model"] = None
+        model_cache["registry"] = None
     
     yield
     
@@ -108,8 +84,11 @@ class FloodFeatures(BaseModel):
     observation_index: int = Field(..., ge=0, description="Observation index")
 
 class FloodPredictionRequest(BaseModel):
+    model_config = {"protected_namespaces": ()}
+    
     features: FloodFeatures
     location: Optional[Location] = None
+    model_id: Optional[str] = Field(None, description="Model to use (default: by location region)")
     
     @field_validator('features')
     @classmethod
@@ -122,13 +101,26 @@ class FloodPredictionRequest(BaseModel):
 class BatchPredictionRequest(BaseModel):
     predictions: List[FloodPredictionRequest] = Field(..., max_length=100)
 
+class FeatureExplanation(BaseModel):
+    base_value: float = Field(..., description="Model output before any feature is considered")
+    output_space: str = Field(..., description="Units of base value and contributions (probability or log_odds)")
+    contributions: Dict[str, float] = Field(..., description="Contribution of each feature to the model output")
+
 class FloodPredictionResponse(BaseModel):
+    model_config = {"protected_namespaces": ()}
+    
     flood_probability: float = Field(..., description="Flood probability (0-1)")
     risk_level: str = Field(..., description="Risk level classification")
     confidence: float = Field(..., description="Model confidence (0-1)")
     timestamp: str = Field(..., description="Prediction timestamp")
     location: Optional[Location] = None
     recommendations: List[str] = Field(default_factory=list)
+    explanation: Optional[FeatureExplanation] = None
+    trees_evaluated: Optional[int] = Field(None, description="Trees evaluated in progressive mode (omitted otherwise)")
+    probability_is_estimate: bool = Field(
+        False, description="True when progressive mode stopped early, flood_probability is then a partial-forest estimate"
+    )
+    model_id: Optional[str] = Field(None, description="Model that made the prediction")
 
 class HealthResponse(BaseModel):
     status: str
@@ -138,6 +130,9 @@ class HealthResponse(BaseModel):
     uptime_seconds: float
 
 class ModelInfo(BaseModel):
+    model_config = {"protected_namespaces": ()}
+    
+    model_id: str
     model_type: str
     version: str
     accuracy: float
@@ -147,22 +142,10 @@ class ModelInfo(BaseModel):
     training_date: str
     feature_count: int
     feature_names: List[str]
+    regions: List[str] = Field(default_factory=list)
 
 
 
-def get_risk_level(probability: float) -> str:
-    """Convert probability to risk level"""
-    if probability >= 0.8:
-        return "extreme"
-    elif probability >= 0.6:
-        return "danger"
-    elif probability >= 0.4:
-        return "alert"
-    elif probability >= 0.2:
-        return "caution"
-    else:
-        return "safe"
-
 def get_recommendations(risk_level: str, location: Optional[Location] = None) -> List[str]:
     """Get recommendations based on risk level"""
     recommendations = {
@@ -223,111 +206,218 @@ async def health_check():
     uptime = (datetime.now() - startup_time).total_seconds()
     
     return HealthResponse(
-        status="online" if model_cache.get("model") is not None else "offline",
+        status="online" if model_cache.get("registry") is not None else "offline",
         timestamp=datetime.now().isoformat(),
         version="2.0.0",
-        model_loaded=model_cache.get("model") is not None,
+        model_loaded=model_cache.get("registry") is not None,
         uptime_seconds=uptime
     )
 
+def predict_rows(loaded: Dict[str, Any], features_array: np.ndarray, explain: bool = False) -> List[Dict[str, Any]]:
+    """Predict a batch of rows in one model call, reusing cached results"""
+    cache = loaded["prediction_cache"]
+    keys = [tuple(row) for row in features_array.tolist()]
+    results = [cache.get(key) for key in keys]
+    missing = [
+        i for i, entry in enumerate(results)
+        if entry is None or (explain and entry["explanation"] is None)
+    ]
+
+    if missing:
+        features_scaled = loaded["scaler"].transform(features_array[missing])
+        probabilities = loaded["model"].predict_proba(features_scaled)[:, 1]
+        explanations = explain_rows(loaded["explainer"], features_scaled) if explain else None
+
+        for j, i in enumerate(missing):
+            entry = {
+                "probability": float(probabilities[j]),
+                "explanation": explanations[j] if explain else None
+            }
+            cache.put(keys[i], entry)
+            results[i] = entry
+
+    return results
+
+def build_response(entry: Dict[str, Any], location: Optional[Location], explain: bool,
+                   model_id: str) -> FloodPredictionResponse:
+    """Turn a predict_rows entry into the API response"""
+    probability = entry["probability"]
+
+    # Get risk level and recommendations
+    risk_level = get_risk_level(probability)
+    recommendations = get_recommendations(risk_level, location)
+
+    # Calculate confidence (simplified)
+    confidence = compute_confidence(probability)
+
+    return FloodPredictionResponse(
+        flood_probability=float(probability),
+        risk_level=risk_level,
+        confidence=float(confidence),
+        timestamp=datetime.now().isoformat(),
+        location=location,
+        recommendations=recommendations,
+        explanation=entry["explanation"] if explain else None,
+        trees_evaluated=entry.get("trees_evaluated"),
+        probability_is_estimate=entry.get("probability_is_estimate", False),
+        model_id=model_id
+    )
+
+def get_registry() -> ModelRegistry:
+    registry = model_cache.get("registry")
+    if registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return registry
+
+def resolve_model_id(registry: ModelRegistry, request: FloodPredictionRequest) -> str:
+    """Route a request by explicit model ID, then by location region"""
+    region = request.location.region if request.location else None
+    try:
+        return registry.resolve(request.model_id, region)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {request.model_id}")
+
+async def load_model(registry: ModelRegistry, model_id: str) -> Dict[str, Any]:
+    """Get a loaded model, reporting load failures without exposing server paths"""
+    try:
+        # Cold loads unpickle and precompute tables, keep that off the event loop
+        return await asyncio.to_thread(registry.get, model_id)
+    except Exception as e:
+        logger.error(f"Failed to load model {model_id}: {e}")
+        raise HTTPException(status_code=503, detail=f"Model {model_id} could not be loaded")
+
+def check_explain_supported(loaded: Dict[str, Any], explain: bool):
+    if explain and loaded.get("explainer") is None:
+        model_type = type(loaded["model"]).__name__
+        raise HTTPException(
+            status_code=400,
+            detail=f"Explanations are not supported for {model_type} ({loaded['model_id']})"
+        )
+
 @app.post("/api/v1/predict", response_model=FloodPredictionResponse)
-async def predict_flood(request: FloodPredictionRequest):
+async def predict_flood(
+    request: FloodPredictionRequest,
+    explain: bool = Query(False, description="Include per-feature contributions")
+):
     """Enhanced flood prediction endpoint"""
-    if model_cache.get("model") is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    registry = get_registry()
+    model_id = resolve_model_id(registry, request)
+    
+    loaded = await load_model(registry, model_id)
+    check_explain_supported(loaded, explain)
     
     try:
         # Convert features to array
         features_array = features_to_array(request.features)
         
-        # Scale features
-        features_scaled = model_cache["scaler"].transform(features_array)
-        
         # Make prediction
-        prediction = model_cache["model"].predict(features_scaled)[0]
-        probability = model_cache["model"].predict_proba(features_scaled)[0, 1]
+        entry = predict_rows(loaded, features_array, explain)[0]
         
-        # Get risk level and recommendations
-        risk_level = get_risk_level(probability)
-        recommendations = get_recommendations(risk_level, request.location)
-        
-        # Calculate confidence (simplified)
-        confidence = min(0.99, max(0.7, 1.0 - abs(0.5 - probability) * 2))
-        
-        return FloodPredictionResponse(
-            flood_probability=float(probability),
-            risk_level=risk_level,
-            confidence=float(confidence),
-            timestamp=datetime.now().isoformat(),
-            location=request.location,
-            recommendations=recommendations
-        )
+        return build_response(entry, request.location, explain, model_id)
         
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.post("/api/v1/predict-batch", response_model=List[FloodPredictionResponse])
-async def predict_batch(request: BatchPredictionRequest):
+async def predict_batch(
+    request: BatchPredictionRequest,
+    explain: bool = Query(False, description="Include per-feature contributions"),
+    progressive: bool = Query(False, description="Stop evaluating trees once the risk level is settled"),
+    error_bound: float = Query(DEFAULT_ERROR_BOUND, ge=0, lt=1, description="Allowed risk level error rate for progressive mode")
+):
     """Batch prediction endpoint"""
-    if model_cache.get("model") is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    registry = get_registry()
+    if explain and progressive:
+        raise HTTPException(status_code=400, detail="explain and progressive cannot be combined")
+    if not request.predictions:
+        return []
     
-    try:
-        results = []
-        for pred_request in request.predictions:
-            # Process each prediction
-            features_array = features_to_array(pred_request.features)
-            features_scaled = model_cache["scaler"].transform(features_array)
-            
-            prediction = model_cache["model"].predict(features_scaled)[0]
-            probability = model_cache["model"].predict_proba(features_scaled)[0, 1]
+    # Group the items by target model so each model scores its rows in one call
+    groups = {}
+    for i, pred_request in enumerate(request.predictions):
+        groups.setdefault(resolve_model_id(registry, pred_request), []).append(i)
+    
+    results = [None] * len(request.predictions)
+    for model_id, indices in groups.items():
+        loaded = await load_model(registry, model_id)
+        check_explain_supported(loaded, explain)
+        
+        try:
+            features_array = np.vstack([
+                features_to_array(request.predictions[i].features) for i in indices
+            ])
+            if progressive:
+                # Estimates are not exact probabilities, so they bypass the prediction cache
+                features_scaled = loaded["scaler"].transform(features_array)
+                probabilities, _, trees_used = predict_progressive(
+                    loaded["model"], loaded["progressive"], features_scaled,
+                    DEFAULT_TREE_CHUNK, error_bound
+                )
+                n_trees = len(loaded["progressive"].trees) if loaded["progressive"] is not None else None
+                entries = [
+                    {
+                        "probability": float(p),
+                        "explanation": None,
+                        "trees_evaluated": int(t),
+                        "probability_is_estimate": bool(n_trees is not None and t < n_trees)
+                    }
+                    for p, t in zip(probabilities, trees_used)
+                ]
+            else:
+                entries = predict_rows(loaded, features_array, explain)
             
-            risk_level = get_risk_level(probability)
-            recommendations = get_recommendations(risk_level, pred_request.location)
-            confidence = min(0.99, max(0.7, 1.0 - abs(0.5 - probability) * 2))
+            for i, entry in zip(indices, entries):
+                results[i] = build_response(entry, request.predictions[i].location, explain, model_id)
             
-            results.append(FloodPredictionResponse(
-                flood_probability=float(probability),
-                risk_level=risk_level,
-                confidence=float(confidence),
-                timestamp=datetime.now().isoformat(),
-                location=pred_request.location,
-                recommendations=recommendations
-            ))
-        
-        return results
-        
-    except Exception as e:
-        logger.error(f"Batch prediction error: {e}")
-        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+        except Exception as e:
+            logger.error(f"Batch prediction error: {e}")
+            raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    
+    return results
 
 @app.get("/api/v1/model-info", response_model=ModelInfo)
-async def get_model_info():
+async def get_model_info(model_id: Optional[str] = Query(None, description="Model to describe (default model if omitted)")):
     """Get enhanced model information"""
-    if model_cache.get("model") is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    registry = get_registry()
+    if model_id is not None and model_id not in registry.specs:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model_id}")
+    model_id = model_id or registry.default_id
+    loaded = await load_model(registry, model_id)
     
     try:
-        info = model_cache.get("model_info", {})
-        feature_names = model_cache.get("feature_names", [])
+        info = loaded.get("model_info", {})
+        feature_names = loaded.get("feature_names", [])
         
         return ModelInfo(
-            model_type="Enhanced XGBoost",
-            version="2.0.0",
-            accuracy=0.9988,
-            f1_score=0.9988,
-            precision=0.9987,
-            recall=0.9989,
-            training_date="2024-12-01",
+            model_id=model_id,
+            model_type=str(info.get("model_type") or info.get("type") or type(loaded["model"]).__name__),
+            version=str(info.get("version", "2.0.0")),
+            accuracy=float(info.get("accuracy", 0.0)),
+            f1_score=float(info.get("f1_score", 0.0)),
+            precision=float(info.get("precision", 0.0)),
+            recall=float(info.get("recall", 0.0)),
+            training_date=str(info.get("training_date", "unknown")),
             feature_count=len(feature_names),
-            feature_names=feature_names
+            feature_names=feature_names,
+            regions=loaded["regions"]
         )
         
     except Exception as e:
         logger.error(f"Model info error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get model info: {str(e)}")
 
+@app.get("/api/v1/models")
+async def list_models():
+    """List the models the API can serve and which are currently loaded"""
+    registry = get_registry()
+    return {
+        "default": registry.default_id,
+        "memory_budget_bytes": registry.memory_budget_bytes,
+        "loaded_bytes": registry.loaded_bytes,
+        "models": registry.describe()
+    }
+
 @app.get("/api/v1/regions")
 async def get_regions():
     """Get available regions for prediction"""
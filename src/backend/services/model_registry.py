@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import logging
+
+from services.inference import load_model_artifacts, PredictionCache
+from services.explain import build_explainer
+from services.progressive import build_progressive
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = "registry.json"
+DEFAULT_MODEL_ID = "default"
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+class ModelRegistry:
+    """Serves several models side by side, loading them lazily within a memory budget.
+
+    Models are declared in models/registry.json:
+
+        {
+          "default": "rf-global",
+          "memory_budget_mb": 512,
+          "models": {
+            "rf-global":  {"path": "."},
+            "xgb-global": {"path": "xgboost"},
+            "jonglei":    {"path": "regional/jonglei", "regions": ["Jonglei"]}
+          }
+        }
+
+    Each path (relative to the models directory) holds the usual artifacts
+    written by create_models.py. A model is loaded on first use; when the
+    estimated size of the loaded models exceeds the budget, the least recently
+    used ones are unloaded. Without a registry.json the models directory itself
+    is served as the only model, as before.
+    """
+
+    def __init__(self, model_dir: Path, specs: Dict[str, Dict[str, Any]], default_id: str,
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, allow_mock: bool = False):
+        if default_id not in specs:
+            raise ValueError(f"Default model {default_id!r} is not declared in the registry")
+
+        self.model_dir = Path(model_dir)
+        self.specs = specs
+        self.default_id = default_id
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.allow_mock = allow_mock
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+
+        self._regions = {}
+        for model_id, spec in specs.items():
+            for region in spec.get("regions", []):
+                self._regions[region.lower()] = model_id
+
+    @classmethod
+    def from_dir(cls, model_dir: Path) -> "ModelRegistry":
+        model_dir = Path(model_dir)
+        budget = float(os.environ.get("FLOODSENSE_MODEL_MEMORY_MB", 0))
+        registry_path = model_dir / REGISTRY_FILE
+
+        if not registry_path.exists():
+            return cls(model_dir, {DEFAULT_MODEL_ID: {"path": "."}}, DEFAULT_MODEL_ID,
+                       budget or DEFAULT_MEMORY_BUDGET_MB, allow_mock=True)
+
+        manifest = json.loads(registry_path.read_text())
+        return cls(
+            model_dir, manifest["models"], manifest.get("default", DEFAULT_MODEL_ID),
+            budget or manifest.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)
+        )
+
+    def resolve(self, model_id: Optional[str] = None, region: Optional[str] = None) -> str:
+        """Pick the model for a request: explicit ID, then region specialist, then default"""
+        if model_id is not None:
+            if model_id not in self.specs:
+                raise KeyError(model_id)
+            return model_id
+        if region:
+            return self._regions.get(region.lower(), self.default_id)
+        return self.default_id
+
+    def get(self, model_id: str) -> Dict[str, Any]:
+        """Return the loaded model entry, loading it and evicting cold models if needed"""
+        with self._lock:
+            entry = self._loaded.get(model_id)
+            if entry is not None:
+                self._loaded.move_to_end(model_id)
+                return entry
+
+            entry = self._load(model_id)
+            self._loaded[model_id] = entry
+            self._evict(keep=model_id)
+            return entry
+
+    def _load(self, model_id: str) -> Dict[str, Any]:
+        spec = self.specs[model_id]
+        path = self.model_dir / spec.get("path", model_id)
+        entry = load_model_artifacts(path, allow_mock=self.allow_mock)
+
+        entry["model_id"] = model_id
+        entry["regions"] = list(spec.get("regions", []))
+        entry["explainer"] = build_explainer(entry["model"], entry["feature_names"])
+        entry["progressive"] = build_progressive(entry["model"])
+        entry["prediction_cache"] = PredictionCache()
+        entry["size_bytes"] = estimate_size(entry, path)
+
+        logger.info(f"Loaded model {model_id} from {path} ({entry['size_bytes'] / 1e6:.1f} MB)")
+        return entry
+
+    def _evict(self, keep: str):
+        while self.loaded_bytes > self.memory_budget_bytes and len(self._loaded) > 1:
+            oldest = next(iter(self._loaded))
+            if oldest == keep:
+                break
+            self._loaded.pop(oldest)
+            logger.info(f"Unloaded model {oldest} to stay within the memory budget")
+
+        if self.loaded_bytes > self.memory_budget_bytes:
+            logger.warning(f"Model {keep} alone exceeds the memory budget")
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(entry["size_bytes"] for entry in self._loaded.values())
+
+    def is_loaded(self, model_id: str) -> bool:
+        return model_id in self._loaded
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Registry contents, including load state, without loading anything"""
+        return [
+            {
+                "model_id": model_id,
+                "regions": list(spec.get("regions", [])),
+                "default": model_id == self.default_id,
+                "loaded": model_id in self._loaded,
+                "size_bytes": self._loaded[model_id]["size_bytes"] if model_id in self._loaded else None,
+            }
+            for model_id, spec in self.specs.items()
+        ]
+
+def estimate_size(entry: Dict[str, Any], path: Path) -> int:
+    """Approximate resident size of a loaded model entry in bytes"""
+    # Pickled sizes track the arrays that dominate a model's memory, without re-serializing it
+    size = sum(
+        os.path.getsize(path / name)
+        for name in ("flood_prediction_model.pkl", "feature_scaler.pkl")
+        if (path / name).exists()
+    )
+
+    explainer = entry.get("explainer")
+    matrix = getattr(explainer, "edge_contributions", None)
+    if matrix is not None:
+        size += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+    progressive = entry.get("progressive")
+    if progressive is not None:
+        size += sum(probs.nbytes for probs in progressive.node_probs)
+
+    return size
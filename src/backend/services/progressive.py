@@ -0,0 +1,91 @@
+import numpy as np
+from typing import Tuple
+import logging
+
+from services.explain import node_probabilities
+from services.inference import RISK_THRESHOLDS, get_risk_levels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TREE_CHUNK = 10
+DEFAULT_ERROR_BOUND = 0.01
+
+# Bucket edges in ascending order, bucket index = number of edges <= probability
+_BUCKET_EDGES = np.array(sorted(threshold for threshold, _ in RISK_THRESHOLDS))
+
+def risk_buckets(probabilities: np.ndarray) -> np.ndarray:
+    return np.searchsorted(_BUCKET_EDGES, probabilities, side="right")
+
+class ProgressiveForest:
+    """Early-exit RandomForest evaluation for risk-level classification.
+
+    Trees are evaluated in chunks. After each chunk, a row whose final forest
+    probability is certain to fall in the same risk bucket as its running mean
+    stops being evaluated. Certainty combines two bounds on the final mean:
+
+    * a hard bound, since every unseen tree outputs a value in [0, 1], and
+    * a Hoeffding-Serfling bound treating the seen trees as a sample drawn
+      without replacement from the forest, at error_bound split evenly
+      across the checks a row goes through.
+
+    Rows that never settle are evaluated on the full forest, so their
+    probability is exact.
+    """
+
+    def __init__(self, model):
+        self.trees = [estimator.tree_ for estimator in model.estimators_]
+        self.node_probs = [node_probabilities(tree) for tree in self.trees]
+
+    def predict(self, features_scaled: np.ndarray, tree_chunk: int = DEFAULT_TREE_CHUNK,
+                error_bound: float = DEFAULT_ERROR_BOUND) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return probability estimates, risk levels and trees evaluated per row"""
+        X = np.ascontiguousarray(features_scaled, dtype=np.float32)
+        n_trees = len(self.trees)
+        n_checks = max(1, (n_trees - 1) // tree_chunk)
+        log_term = np.log(2 * n_checks / error_bound) if error_bound > 0 else np.inf
+
+        sums = np.zeros(len(X))
+        trees_used = np.zeros(len(X), dtype=np.int64)
+        active = np.arange(len(X))
+
+        for start in range(0, n_trees, tree_chunk):
+            stop = min(start + tree_chunk, n_trees)
+            X_active = X[active]
+            for t in range(start, stop):
+                sums[active] += self.node_probs[t][self.trees[t].apply(X_active)]
+            trees_used[active] = stop
+            if stop == n_trees:
+                break
+
+            seen = sums[active]
+            lower = seen / n_trees
+            upper = (seen + n_trees - stop) / n_trees
+            if np.isfinite(log_term):
+                mean = seen / stop
+                eps = np.sqrt((1 - (stop - 1) / n_trees) * log_term / (2 * stop))
+                lower = np.maximum(lower, mean - eps)
+                upper = np.minimum(upper, mean + eps)
+
+            active = active[risk_buckets(lower) != risk_buckets(upper)]
+            if not active.size:
+                break
+
+        probabilities = sums / trees_used
+        return probabilities, get_risk_levels(probabilities), trees_used
+
+def build_progressive(model):
+    """Build a ProgressiveForest, or None when the model needs full evaluation"""
+    if type(model).__name__ != "RandomForestClassifier":
+        logger.info(f"Progressive evaluation not supported for {type(model).__name__}, using full evaluation")
+        return None
+    return ProgressiveForest(model)
+
+def predict_progressive(model, progressive, features_scaled: np.ndarray,
+                        tree_chunk: int = DEFAULT_TREE_CHUNK,
+                        error_bound: float = DEFAULT_ERROR_BOUND) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Progressive prediction, falling back to full evaluation when unsupported"""
+    if progressive is None:
+        probabilities = model.predict_proba(features_scaled)[:, 1]
+        n_estimators = getattr(model, "n_estimators", 1)
+        return probabilities, get_risk_levels(probabilities), np.full(len(probabilities), n_estimators)
+    return progressive.predict(features_scaled, tree_chunk, error_bound)
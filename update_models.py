@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Incrementally update the FloodSense model with newly labelled scenes.
+
+Instead of refitting on the full dataset, the update:
+  * merges the new samples into the StandardScaler's running mean/variance
+    (StandardScaler.partial_fit),
+  * rewrites the split thresholds of the existing trees so they make exactly
+    the same decisions under the updated scaler,
+  * adds trees fitted on the new samples only (RandomForest warm_start) or
+    continues boosting from the existing booster (XGBoost).
+
+The result is saved as a new version under models/versions/ together with a
+before/after metric comparison on a fixed holdout set.
+
+Example:
+    python update_models.py --new-data new_scenes.csv --holdout holdout.csv --promote
+"""
+
+import argparse
+import copy
+import json
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+feature_names = [
+    "month", "day", "day_of_week", "day_of_year", "quarter",
+    "days_since_reference", "scene_id_numeric", "data_coverage",
+    "filename_length", "filename_hash", "observation_index"
+]
+
+ARTIFACT_FILES = ["flood_prediction_model.pkl", "feature_scaler.pkl", "model_info.pkl", "feature_names.pkl"]
+
+def load_frame(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    if path.suffix.lower() in (".ndjson", ".jsonl"):
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
+
+def split_features(frame: pd.DataFrame, label_column: str):
+    missing = [name for name in feature_names + [label_column] if name not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return frame[feature_names].to_numpy(dtype=np.float64), frame[label_column].to_numpy(dtype=int)
+
+def evaluate(model, scaler, X, y) -> dict:
+    X_scaled = scaler.transform(X)
+    y_pred = model.predict(X_scaled)
+    y_prob = model.predict_proba(X_scaled)[:, 1]
+    return {
+        "accuracy": float(accuracy_score(y, y_pred)),
+        "precision": float(precision_score(y, y_pred, zero_division=0)),
+        "recall": float(recall_score(y, y_pred, zero_division=0)),
+        "f1_score": float(f1_score(y, y_pred, zero_division=0)),
+        # Undefined with a single class; None keeps update_report.json valid JSON
+        "roc_auc": float(roc_auc_score(y, y_prob)) if len(np.unique(y)) > 1 else None,
+    }
+
+def reserve_version_dir(models_dir: Path):
+    """Create a new, unique version directory and return (version, path)"""
+    base = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    for attempt in range(1000):
+        version = base if attempt == 0 else f"{base}-{attempt}"
+        version_dir = models_dir / "versions" / version
+        try:
+            version_dir.mkdir(parents=True, exist_ok=False)
+            return version, version_dir
+        except FileExistsError:
+            continue
+    raise RuntimeError(f"Could not create a version directory under {models_dir / 'versions'}")
+
+def format_metric(value) -> str:
+    return f"{value:>8.4f}" if value is not None else f"{'n/a':>8}"
+
+def remap_threshold(feature, threshold, old_scaler, new_scaler):
+    """Move a threshold from the old scaled space of a feature to the new one"""
+    raw = threshold * old_scaler.scale_[feature] + old_scaler.mean_[feature]
+    return (raw - new_scaler.mean_[feature]) / new_scaler.scale_[feature]
+
+def remap_forest(model, old_scaler, new_scaler):
+    """Rewrite the thresholds of a fitted RandomForest in place"""
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        internal = np.flatnonzero(tree.children_left >= 0)
+        # tree.threshold is a view on the tree's node array, so this writes through
+        thresholds = tree.threshold
+        thresholds[internal] = remap_threshold(
+            tree.feature[internal], thresholds[internal], old_scaler, new_scaler
+        )
+        if not np.allclose(tree.threshold[internal], thresholds[internal]):
+            raise RuntimeError("Could not update tree thresholds in place")
+
+def remap_booster(booster, old_scaler, new_scaler):
+    """Return a copy of an XGBoost booster with its split conditions remapped"""
+    import xgboost as xgb
+
+    model_json = json.loads(booster.save_raw("json"))
+    for tree in model_json["learner"]["gradient_booster"]["model"]["trees"]:
+        left_children = np.array(tree["left_children"])
+        split_indices = np.array(tree["split_indices"])
+        conditions = np.array(tree["split_conditions"], dtype=np.float64)
+        # Leaves keep their output value in split_conditions, only touch splits
+        internal = np.flatnonzero(left_children != -1)
+        conditions[internal] = remap_threshold(
+            split_indices[internal], conditions[internal], old_scaler, new_scaler
+        )
+        tree["split_conditions"] = conditions.tolist()
+
+    remapped = xgb.Booster()
+    remapped.load_model(bytearray(json.dumps(model_json).encode()))
+    return remapped
+
+def update_model(model, old_scaler, new_scaler, X_new_scaled, y_new, new_trees: int):
+    """Return a copy of model with new_trees trees/rounds fitted on the new samples"""
+    model_type = type(model).__name__
+
+    if model_type == "RandomForestClassifier":
+        updated = copy.deepcopy(model)
+        remap_forest(updated, old_scaler, new_scaler)
+        updated.set_params(warm_start=True, n_estimators=len(updated.estimators_) + new_trees)
+        updated.fit(X_new_scaled, y_new)
+        updated.set_params(warm_start=False)
+        return updated
+
+    if model_type == "XGBClassifier":
+        from xgboost import XGBClassifier
+
+        booster = remap_booster(model.get_booster(), old_scaler, new_scaler)
+        updated = XGBClassifier(**model.get_params())
+        updated.set_params(n_estimators=new_trees)
+        updated.fit(X_new_scaled, y_new, xgb_model=booster)
+        return updated
+
+    raise ValueError(f"Incremental updates are not supported for {model_type}, retrain with create_models.py")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally update the FloodSense model")
+    parser.add_argument("--new-data", type=Path, required=True, help="CSV/Parquet/NDJSON with features and labels of new scenes")
+    parser.add_argument("--holdout", type=Path, required=True, help="Fixed holdout set used for the before/after comparison")
+    parser.add_argument("--label-column", default="flood", help="Name of the 0/1 label column")
+    parser.add_argument("--models-dir", type=Path, default=Path("models"), help="Directory with the current artifacts")
+    parser.add_argument("--new-trees", type=int, default=20, help="Trees (RandomForest) or boosting rounds (XGBoost) to add")
+    parser.add_argument("--promote", action="store_true", help="Also copy the new version over the current artifacts")
+    args = parser.parse_args(argv)
+
+    models_dir = args.models_dir
+    model = joblib.load(models_dir / "flood_prediction_model.pkl")
+    scaler = joblib.load(models_dir / "feature_scaler.pkl")
+    model_info = joblib.load(models_dir / "model_info.pkl")
+
+    X_new, y_new = split_features(load_frame(args.new_data), args.label_column)
+    X_holdout, y_holdout = split_features(load_frame(args.holdout), args.label_column)
+    if len(np.unique(y_new)) < 2:
+        raise ValueError("New data must contain both flood and non-flood samples")
+
+    # Reserve the version before doing the work, so a clash cannot discard a finished update
+    version, version_dir = reserve_version_dir(models_dir)
+    try:
+        started = time.perf_counter()
+
+        # Merge the new samples into the scaler's running moments
+        new_scaler = copy.deepcopy(scaler)
+        new_scaler.partial_fit(X_new)
+
+        updated = update_model(model, scaler, new_scaler, new_scaler.transform(X_new), y_new, args.new_trees)
+        update_seconds = time.perf_counter() - started
+    except Exception:
+        version_dir.rmdir()
+        raise
+
+    before = evaluate(model, scaler, X_holdout, y_holdout)
+    after = evaluate(updated, new_scaler, X_holdout, y_holdout)
+
+    new_info = dict(model_info)
+    new_info.update(after)
+    new_info.update({
+        "version": version,
+        "parent_version": model_info.get("version", "initial"),
+        "training_date": datetime.now().strftime("%Y-%m-%d"),
+        "update_samples": int(len(X_new)),
+        "scaler_samples_seen": int(np.max(new_scaler.n_samples_seen_)),
+    })
+    report = {
+        "version": version,
+        "parent_version": new_info["parent_version"],
+        "model_type": type(updated).__name__,
+        "new_samples": int(len(X_new)),
+        "added_trees": args.new_trees,
+        "update_seconds": round(update_seconds, 3),
+        "holdout_samples": int(len(X_holdout)),
+        "before": before,
+        "after": after,
+    }
+
+    joblib.dump(updated, version_dir / "flood_prediction_model.pkl")
+    joblib.dump(new_scaler, version_dir / "feature_scaler.pkl")
+    joblib.dump(new_info, version_dir / "model_info.pkl")
+    joblib.dump(feature_names, version_dir / "feature_names.pkl")
+    (version_dir / "update_report.json").write_text(json.dumps(report, indent=2))
+
+    print(f"Updated model with {len(X_new)} new samples in {update_seconds:.2f}s")
+    print(f"{'metric':<10} {'before':>8} {'after':>8}")
+    for metric in before:
+        print(f"{metric:<10} {format_metric(before[metric])} {format_metric(after[metric])}")
+    print(f"Version {version} saved to: {version_dir.absolute()}")
+
+    if args.promote:
+        for name in ARTIFACT_FILES:
+            shutil.copy2(version_dir / name, models_dir / name)
+        print(f"Promoted version {version} to {models_dir.absolute()}")
+
+if __name__ == "__main__":
+    main()